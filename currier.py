@@ -30,12 +30,17 @@
 #
 # Para facilitar o raciocínio, vamos usar uma função `f` bem simples e tomá-la
 # como uma função que recebe 2 argumentos numéricos e retorna a soma deles.
+#
+# Os `assert` espalhados pelo texto conferem cada passo.
+# Eles ficam dentro de `if __name__ == "__main__":` para que rodem ao executarmos
+# o arquivo (ou as células), mas não a cada `import currier`.
 
 # %%
 def adicao_classica(x, y):
     return x + y
 
-assert adicao_classica(3, 5) == 3 + 5
+if __name__ == "__main__":
+    assert adicao_classica(3, 5) == 3 + 5
 
 # %% [markdown]
 # Agora queremos passar os argumentos `3` e  `5` um de cada vez.
@@ -75,7 +80,8 @@ soma_3 = construtor_de_adicao(3)      # Invocamos construtor_de_adicao com valor
                                       # somador_parcial passe esse 3 adiante quando invocar
                                       # adicao_classica
 
-assert soma_3(5) == 3 + 5
+if __name__ == "__main__":
+    assert soma_3(5) == 3 + 5
 
 # %% [markdown]
 # Funciona!
@@ -92,7 +98,8 @@ assert soma_3(5) == 3 + 5
 # %%
 soma_curried = construtor_de_adicao
 
-assert soma_curried(3)(5) == 3 + 5
+if __name__ == "__main__":
+    assert soma_curried(3)(5) == 3 + 5
 
 # %% [markdown]
 # Legal! Vamos tentar abstrair o padrão e generalizar a solução em um decorador.
@@ -157,7 +164,8 @@ def curry_em_2_passos(funcao_sem_curry):
 def soma_2_parcelas(x, y):
     return x + y
 
-assert soma_2_parcelas(3)(5) == 3 + 5
+if __name__ == "__main__":
+    assert soma_2_parcelas(3)(5) == 3 + 5
 
 
 #%% [markdown]
@@ -207,7 +215,8 @@ def currying_do_1o_arg(funcao_sem_curry):
 def soma_3_parcelas(x, y, z):
     return x + y + z
 
-assert soma_3_parcelas(3)(5, 7) == 3 + 5 + 7
+if __name__ == "__main__":
+    assert soma_3_parcelas(3)(5, 7) == 3 + 5 + 7
 
 #%% [markdown]
 #
@@ -216,10 +225,11 @@ assert soma_3_parcelas(3)(5, 7) == 3 + 5 + 7
 # tivesse sido curried até o fim.
 
 #%%
-try:
-    soma_3_parcelas(3)(5)(7)
-except TypeError as t:
-    assert str(t) == "soma_3_parcelas() missing 1 required positional argument: 'z'"
+if __name__ == "__main__":
+    try:
+        soma_3_parcelas(3)(5)(7)
+    except TypeError as t:
+        assert str(t) == "soma_3_parcelas() missing 1 required positional argument: 'z'"
 
 #%% [markdown]
 # Como podemos observar, nesse caso temos um `TypeError` que nos informa termos
@@ -243,10 +253,11 @@ except TypeError as t:
 def soma_3_parcelas_nova_tantativa(x, y, z):
     return x + y + z
 
-try:
-    soma_3_parcelas_nova_tantativa(3)(5)(7)
-except TypeError as t:
-    assert str(t) == "recebe_primeiro_parametro() takes 1 positional argument but 2 were given"
+if __name__ == "__main__":
+    try:
+        soma_3_parcelas_nova_tantativa(3)(5)(7)
+    except TypeError as t:
+        assert str(t).endswith("recebe_primeiro_parametro() takes 1 positional argument but 2 were given")
 
 #%% [markdown]
 #
@@ -261,7 +272,8 @@ def soma_3_parcelas_versao_estranha(x, y, z):
 inclui_3_na_soma = soma_3_parcelas_versao_estranha(3)
 inclui_3_na_soma = currying_do_1o_arg(inclui_3_na_soma)
 
-assert inclui_3_na_soma(5)(7) == 3 + 5 + 7
+if __name__ == "__main__":
+    assert inclui_3_na_soma(5)(7) == 3 + 5 + 7
 
 #%% [markdown]
 #
@@ -317,7 +329,8 @@ def soma_3_parcelas_com_z_curried(x, y):
 
     return recebe_z_e_soma
 
-assert soma_3_parcelas_com_z_curried(3, 5)(7) == 3 + 5 + 7
+if __name__ == "__main__":
+    assert soma_3_parcelas_com_z_curried(3, 5)(7) == 3 + 5 + 7
 
 #%% [markdown]
 #
@@ -330,7 +343,8 @@ assert soma_3_parcelas_com_z_curried(3, 5)(7) == 3 + 5 + 7
 #%%
 soma_3_curried = currying_do_1o_arg(soma_3_parcelas_com_z_curried)
 
-assert soma_3_curried(3)(5)(7) == 3 + 5 + 7
+if __name__ == "__main__":
+    assert soma_3_curried(3)(5)(7) == 3 + 5 + 7
 
 #%% [markdown]
 #
@@ -352,7 +366,8 @@ def curry_ultimo(func):
 def soma_2_parcelas_com_3a(x, y, z):
     return x + y + z
 
-assert soma_2_parcelas_com_3a(3, 5)(7) == 3 + 5 + 7
+if __name__ == "__main__":
+    assert soma_2_parcelas_com_3a(3, 5)(7) == 3 + 5 + 7
 
 #%% [markdown]
 #
@@ -371,7 +386,8 @@ assert soma_2_parcelas_com_3a(3, 5)(7) == 3 + 5 + 7
 def soma_3_curried_nova(x, y, z):
     return x + y + z
 
-assert soma_3_curried_nova(3)(5)(7) == 3 + 5 + 7
+if __name__ == "__main__":
+    assert soma_3_curried_nova(3)(5)(7) == 3 + 5 + 7
 
 #%% [markdown]
 #
@@ -395,7 +411,8 @@ def soma_3_parcelas_n_args(x, y, z):
 
 soma_3_parcelas_n_args = curry_n_args(3, soma_3_parcelas_n_args)
 
-assert soma_3_parcelas_n_args(3)(5)(7) == 3 + 5 + 7
+if __name__ == "__main__":
+    assert soma_3_parcelas_n_args(3)(5)(7) == 3 + 5 + 7
 
 #%% [markdown]
 #
@@ -420,7 +437,8 @@ curry = curry_ultimo(curry_n_args)
 def soma_4_curried(x, y, z, w):
     return x + y + z + w
 
-assert soma_4_curried(1)(2)(3)(4) == 1 + 2 + 3 + 4
+if __name__ == "__main__":
+    assert soma_4_curried(1)(2)(3)(4) == 1 + 2 + 3 + 4
 
 #%% [markdown]
 #
@@ -433,24 +451,45 @@ assert soma_4_curried(1)(2)(3)(4) == 1 + 2 + 3 + 4
 # parâmetro de uma função mas nos esqueçamos de ajustar o argumento passado ao
 # decorador.
 #
-# Sem entrar em muito detalhes sobre como essa parte funciona, o módulo
-# **inspect** pode nos ajudar.
-# Esse módulo é capaz de extrair o número de parâmetros de uma função, de
-# maneira que conseguiremos descobrir essa informação sem precisar passá-la
+# Sem entrar em muito detalhes sobre como essa parte funciona, o próprio Python
+# pode nos ajudar.
+# Toda função guarda informações sobre seu código no atributo `__code__`, e uma
+# delas, `__code__.co_argcount`, é justamente o número de parâmetros posicionais.
+# Assim conseguiremos descobrir essa informação sem precisar passá-la
 # explicitamente ao decorador.
 #
-# A seguir temos o `import` e uma definição de função que realiza o que precisamos.
+# O módulo **inspect** também sabe fazer isso, com `signature`, mas monta um
+# objeto com a descrição completa de cada parâmetro só para contarmos quantos são.
+# Então só recorremos a ele para o que não tem `__code__`, como funções embutidas
+# (`pow`, por exemplo) ou objetos chamáveis.
+# Aproveitamos e tratamos também o caso de um `functools.partial`, que é uma
+# função com alguns argumentos já fixados, e o de um método, em que o `self` já
+# vem preenchido.
+#
+# A seguir temos os `import`s e uma definição de função que realiza o que precisamos.
 
 
 # %%
-from inspect import signature
+from functools import partial
+from inspect import ismethod, signature
 
 def numero_de_parametros(func):
 
-    sig = signature(func)
-    params = sig.parameters
+    if isinstance(func, partial):
+        return numero_de_parametros(func.func) - len(func.args)
+
+    if ismethod(func):
+        return numero_de_parametros(func.__func__) - 1
+
+    if hasattr(func, '__code__'):
+        return func.__code__.co_argcount
 
-    return len(params)
+    return len(signature(func).parameters)
+
+if __name__ == "__main__":
+    assert numero_de_parametros(adicao_classica) == 2
+    assert numero_de_parametros(partial(adicao_classica, 3)) == 1
+    assert numero_de_parametros(pow) == 3
 
 #%% [markdown]
 #
@@ -474,5 +513,294 @@ def soma_4_curried_tudo(x, y, z, w):
 def soma_5_curried_tudo(x, y, z, w, v):
     return x + y + z + w + v
 
-assert soma_4_curried_tudo(1)(2)(3)(4) == 1 + 2 + 3 + 4
-assert soma_5_curried_tudo(1)(2)(3)(4)(5) == 1 + 2 + 3 + 4 + 5
\ No newline at end of file
+if __name__ == "__main__":
+    assert soma_4_curried_tudo(1)(2)(3)(4) == 1 + 2 + 3 + 4
+    assert soma_5_curried_tudo(1)(2)(3)(4)(5) == 1 + 2 + 3 + 4 + 5
+
+def soma_3(x, y, z):
+    return x + y + z
+
+class Somador:
+
+    def soma_3(self, x, y, z):
+        return x + y + z
+
+if __name__ == "__main__":
+    assert curry_tudo(partial(soma_3, 1))(2)(3) == 1 + 2 + 3
+    assert curry_tudo(Somador().soma_3)(1)(2)(3) == 1 + 2 + 3
+    assert curry_tudo(pow)(2)(10)(1000) == 24
+
+#%% [markdown]
+#
+# ## E o desempenho?
+#
+# O `curry_tudo` acima funciona, mas tem um custo escondido.
+# Cada camada de `curry_ultimo` é uma função a mais entre a chamada e a função
+# original.
+# Para uma função de 5 parâmetros, `soma_5_curried_tudo(1)(2)(3)(4)(5)` passa
+# por 4 camadas de `func_sem_ultimo` e `recebe_ultimo` antes de chegar na soma
+# propriamente dita.
+#
+# Como já sabemos o número de parâmetros desde o momento da decoração, podemos
+# fazer diferente: guardar os argumentos recebidos até então e, a cada novo
+# argumento, comparar quantos já temos com o número de parâmetros.
+# Se faltar argumento, devolvemos um novo passo que lembra os argumentos
+# acumulados.
+# Se não faltar, aplicamos a função original de uma vez.
+# É isso que a `recebe_um_arg` abaixo faz, num acumulador explícito numa função
+# própria, em que fica claro quanto custa cada argumento recebido.
+# Os parágrafos a seguir explicam as escolhas dela, e também por que, para as
+# funções mais comuns, nem chegamos a usá-la.
+#
+# De quebra, anotamos na função curried qual foi a função original (no atributo
+# `__wrapped__`, o mesmo usado pelo `functools.wraps`), o nome dela e quantos
+# parâmetros ela tem, para que ninguém precise descobrir isso de novo.
+# Fazemos isso à mão em vez de usar o `functools.wraps` porque só precisamos
+# desses atributos, e o `wraps` copia vários outros.
+# O próprio `curry_tudo` aproveita isso: se receber uma função que já saiu dele,
+# devolve ela como está, sem nem contar parâmetros.
+#
+# Para as funções mais comuns dá pra ir além.
+# Basta encadear os fechamentos, como fizemos lá no `curry_em_2_passos`, só que
+# com `lambda`: para 3 parâmetros,
+# `lambda func: lambda a0: lambda a1: lambda a2: func(a0, a1, a2)`.
+# Assim nenhuma lista é montada e nenhum tamanho é comparado a cada argumento.
+# Como não dá pra escrever isso à mão para cada número de parâmetros, montamos o
+# texto desse código e pedimos ao Python que o transforme em função com `eval`.
+# Isso é feito uma única vez para cada número de parâmetros; depois, o mesmo
+# molde serve para qualquer função com aquele número de parâmetros.
+# Medimos que esse encadeamento é mais rápido que o acumulador abaixo até por
+# volta de 64 parâmetros, onde os dois empatam; dali em diante cada `lambda` nova
+# carrega todos os argumentos anteriores e o acumulador passa a ganhar, então
+# usamos o acumulador só acima disso.
+#
+# Já para muitos parâmetros, guardar os argumentos numa tupla, montando uma
+# tupla nova a cada argumento, fica caro: a tupla é copiada inteira a cada passo.
+# Por isso o acumulador usa uma lista e só acrescenta o argumento novo no fim.
+# O cuidado é que uma aplicação parcial pode ser reaproveitada, como a
+# `soma_de_68` abaixo.
+# Cada passo lembra quantos argumentos já tinha (`k`) e, se a lista já
+# cresceu além disso, é porque alguém continuou a partir dele antes: aí copiamos
+# só o começo da lista.
+#
+# E para que cada passo não precise chamar outra função Python só para montar o
+# fechamento do passo seguinte, o acumulador é uma única função que recebe todo
+# o seu estado como parâmetros.
+# Cada passo é um `functools.partial` dela, que fixa o estado e espera apenas o
+# próximo argumento.
+# Uma alternativa natural seria uma classe com `__slots__` guardando o estado e
+# um `__call__` recebendo o argumento.
+# Testamos: ela fica mais lenta, porque cada passo precisa executar o `__init__`
+# em Python, enquanto o `partial` é montado direto em C.
+
+#%%
+from weakref import WeakValueDictionary
+
+def recebe_um_arg(func, n, recebidos, k, arg):
+
+    if len(recebidos) == k:             # ninguém continuou daqui: reaproveita a lista
+        novos = recebidos
+    else:                               # aplicação parcial reaproveitada: copia
+        novos = recebidos[:k]
+
+    novos.append(arg)
+
+    if len(novos) == n:
+        return func(*novos)             # último argumento: aplica a função
+
+    return partial(recebe_um_arg, func, n, novos, k + 1)
+
+def acumula_args(func, n):
+    return partial(recebe_um_arg, func, n, [], 0)
+
+MAIOR_ARIDADE_COM_MOLDE = 64
+
+moldes_de_curry = {}
+
+def molde_de_curry(n):
+
+    if n not in moldes_de_curry:
+        nomes = [f'a{i}' for i in range(n)]
+        codigo = 'lambda func: ' + ''.join(f'lambda {nome}: ' for nome in nomes)
+        codigo += f'func({", ".join(nomes)})'
+        moldes_de_curry[n] = eval(codigo, {})
+
+    return moldes_de_curry[n]
+
+ja_curried = WeakValueDictionary()
+
+def comeca_acumulo(func, n):
+
+    # A função curried guarda uma referência a func, então enquanto ela estiver
+    # no dicionário o id(func) não pode ser reaproveitado por outra função.
+    chave = (n, id(func))
+    curried = ja_curried.get(chave)
+
+    if curried is not None:
+        return curried
+
+    if n == 2:
+        curried = lambda a: partial(func, a)
+    elif n <= MAIOR_ARIDADE_COM_MOLDE:
+        curried = molde_de_curry(n)(func)
+    else:
+        curried = acumula_args(func, n)
+
+    curried.__wrapped__ = func
+    nome = getattr(func, '__name__', None)
+    if nome is not None:
+        curried.__name__ = nome
+    curried._aridade = n
+    ja_curried[chave] = curried
+
+    return curried
+
+def curry_tudo(func):
+
+    if hasattr(func, '_aridade'):       # já passou por aqui: já é curried
+        return func
+
+    n = numero_de_parametros(func)
+
+    if n < 2:
+        return func
+
+    return comeca_acumulo(func, n)
+
+@curry_tudo
+def soma_5_acumulada(x, y, z, w, v):
+    return x + y + z + w + v
+
+if __name__ == "__main__":
+    soma_1_e_2 = soma_5_acumulada(1)(2)
+
+    assert soma_5_acumulada._aridade == 5
+    assert curry_tudo(soma_5_acumulada) is soma_5_acumulada
+    assert soma_5_acumulada.__name__ == 'soma_5_acumulada'
+    assert soma_1_e_2(3)(4)(5) == 1 + 2 + 3 + 4 + 5
+    assert soma_1_e_2(30)(40)(50) == 1 + 2 + 30 + 40 + 50
+
+@curry_tudo
+def soma_6_acumulada(x, y, z, w, v, u):
+    return x + y + z + w + v + u
+
+soma_de_70 = comeca_acumulo(lambda *parcelas: sum(parcelas), 70)    # usa o acumulador
+
+if __name__ == "__main__":
+    soma_10_e_20 = soma_6_acumulada(10)(20)
+
+    assert soma_6_acumulada(1)(2)(3)(4)(5)(6) == 1 + 2 + 3 + 4 + 5 + 6
+    assert soma_10_e_20(3)(4)(5)(6) == 10 + 20 + 3 + 4 + 5 + 6
+    assert soma_10_e_20(30)(40)(50)(60) == 10 + 20 + 30 + 40 + 50 + 60
+
+    soma_de_68 = soma_de_70
+    for i in range(68):
+        soma_de_68 = soma_de_68(i)
+
+    assert soma_de_68(68)(69) == sum(range(70))
+    assert soma_de_68(0)(0) == sum(range(68))
+
+#%% [markdown]
+#
+# Repare que em nenhum momento tentamos chamar a função original para descobrir,
+# por um `TypeError`, se ainda faltavam argumentos.
+# A função só é chamada quando todos os argumentos chegaram.
+# Isso é mais barato do que lançar e capturar exceções e, além disso, garante que
+# um `TypeError` que aconteça dentro da própria função chegue intacto a quem chamou.
+
+#%%
+@curry_tudo
+def concatena_3(x, y, z):
+    return x + y + z
+
+if __name__ == "__main__":
+    try:
+        concatena_3('a')('b')(1)
+    except TypeError as t:
+        assert str(t) == 'can only concatenate str (not "int") to str'
+    else:
+        raise AssertionError('o TypeError de dentro de concatena_3 foi engolido')
+
+#%% [markdown]
+#
+# O `curry_n_args` tem um problema parecido, mas no momento da decoração.
+# Cada vez que decoramos uma função com `@curry(4)` toda a pilha de `curry_ultimo`
+# é construída de novo, mesmo que aquela função já tenha sido decorada antes.
+#
+# Mas a pilha inteira pode ser trocada pelo mesmo `comeca_acumulo` que usamos
+# no `curry_tudo`.
+# E o `comeca_acumulo` guarda o que já construiu num `WeakValueDictionary`,
+# usando como chave o número de parâmetros e o `id` da função.
+# Decorar de novo a mesma função devolve a mesma função curried, e quando ninguém
+# mais usa a função curried ela some do dicionário sozinha.
+#
+# Já o `curry_ultimo`, que continuamos usando para fazer o `curry` a partir do
+# `curry_n_args`, pode devolver um `functools.partial` no lugar do fechamento
+# `recebe_ultimo`: `partial(func, *args)` fixa os primeiros argumentos e, ao
+# receber o último, chama `func(*args, arg)` diretamente em C.
+
+#%%
+def curry_n_args(n, func):
+
+    if n < 2:
+        return func
+
+    return comeca_acumulo(func, n)
+
+def curry_ultimo(func):
+
+    def func_sem_ultimo(*args):
+        return partial(func, *args)
+
+    func_sem_ultimo.__wrapped__ = func
+    nome = getattr(func, '__name__', None)
+    if nome is not None:
+        func_sem_ultimo.__name__ = nome
+
+    return func_sem_ultimo
+
+curry = curry_ultimo(curry_n_args)
+
+def soma_4_parcelas(x, y, z, w):
+    return x + y + z + w
+
+if __name__ == "__main__":
+    assert curry(4)(soma_4_parcelas) is curry(4)(soma_4_parcelas)
+    assert curry(4)(soma_4_parcelas)(1)(2)(3)(4) == 1 + 2 + 3 + 4
+    assert curry(4)(soma_4_parcelas).__wrapped__ is soma_4_parcelas
+    assert curry(2)(partial(soma_4_parcelas, 1, 2))(3)(4) == 1 + 2 + 3 + 4
+    assert curry_tudo(partial(soma_4_parcelas, 1))(2)(3)(4) == 1 + 2 + 3 + 4
+    assert curry_tudo(Somador().soma_3)(1)(2)(3) == 1 + 2 + 3
+
+#%% [markdown]
+#
+# Por fim, vale saber que a biblioteca padrão já traz pronto o que o
+# `currying_do_1o_arg` faz por dentro: `functools.partial`.
+# `partial(func, x)` devolve um objeto que, ao ser chamado com `*args`, chama
+# `func(x, *args)`.
+# A diferença é que o `partial` é implementado em C, então a segunda chamada nem
+# chega a passar por uma função Python.
+# O mesmo vale para o caso de 2 parâmetros do `comeca_acumulo`.
+
+#%%
+def currying_do_1o_arg(funcao_sem_curry):
+
+    def recebe_primeiro_parametro(x):
+        return partial(funcao_sem_curry, x)
+
+    return recebe_primeiro_parametro
+
+@currying_do_1o_arg
+def soma_3_parcelas_com_partial(x, y, z):
+    return x + y + z
+
+if __name__ == "__main__":
+    assert soma_3_parcelas_com_partial(3)(5, 7) == 3 + 5 + 7
+
+#%% [markdown]
+#
+# Depois dessas mudanças, cada argumento passado custa no máximo uma chamada de
+# função Python e um fechamento (ou um `partial`).
+# O que sobra é o custo de montar cada chamada no interpretador.
+# Eliminar isso exigiria sair do Python puro, por exemplo escrevendo o acumulador
+# em Cython ou como extensão em C, o que foge da proposta deste texto.
@@ -32,10 +32,10 @@
 # %%
 def t_menos_loop(t):
 
-    for n in range(t, 0, -1):
-        print(f'T menos {n}s para o lançamento')
+    linhas = [f'T menos {n}s para o lançamento' for n in range(t, 0, -1)]
+    linhas.append('Temos uma decolagem!!\n...e veio do loop')
 
-    print('Temos uma decolagem!!\n...e veio do loop')
+    print('\n'.join(linhas))   # um único print para a contagem inteira
 
 def t_menos_recursao(t):
 
@@ -158,6 +158,21 @@ t_menos_auto_aplicada(5)
 #
 # Agora, já que já chegamos nesse ponto, por quê não ir além e generalizar a solução?
 # Vamos criar algo que possa fazer essas mesmas transformações passo a passo e automatizar o processo!! \o/
+# %% [markdown]
+# Uma observação rápida: como comentado acima, a biblioteca padrão já oferece esse serviço, através de `functools.partial`.
+# `partial(func, func)` devolve um objeto que, chamado com `param`, executa `func(func, param)`, exatamente como a `func_auto_aplicada`.
+# A vantagem é que o `partial` é implementado em C, então cada chamada economiza uma função Python intermediária.
+#
+# Daqui pra frente o `auto_aplicador` será esse:
+
+# %%
+from functools import partial
+
+def auto_aplicador(func):
+    return partial(func, func)
+
+assert isinstance(auto_aplicador(t_menos_1a_classe_recebendo_1a_classe), partial)
+
 # %% [markdown]
 # Mas antes, um pequeno passeio pelo açúcar sintático dos decoradores em Python.
 #
@@ -329,3 +344,451 @@ def fact(rec, n):
         return n*rec(n-1)
 
 assert fact(5) == 5*4*3*2*1
+
+# %% [markdown]
+# ## Bônus: um `partial` só
+#
+# Olhando de novo para a `auto_aplica_func_interna`, repare que a cada passo da recursão ela chama `auto_aplicador(func_param)`.
+# Ou seja, a cada passo um `partial` novo é criado.
+# Mas, no decorador Y, a `func_param` é sempre a mesma: a própria `nova_func`!
+#
+# Então podemos guardar o resultado da primeira vez num dicionário e reaproveitá-lo nos passos seguintes.
+# Como o `decorador_y` procura a `auto_aplica_func_interna` pelo nome na hora em que é usado, as funções decoradas daqui pra frente já usam a versão nova.
+
+# %%
+def auto_aplica_func_interna(func):
+
+    ja_aplicadas = {}
+
+    def nova_func(func_param, t):
+
+        if func_param not in ja_aplicadas:
+            ja_aplicadas[func_param] = auto_aplicador(func_param)
+
+        return func(ja_aplicadas[func_param], t)
+
+    return nova_func
+
+@decorador_y
+def fact_um_partial(rec, n):
+
+    if n==0:
+        return 1
+    else:
+        return n*rec(n-1)
+
+assert fact_um_partial(5) == 5*4*3*2*1
+
+# %% [markdown]
+# Indo na mesma linha, se a mesma função for decorada mais de uma vez (o que acontece, por exemplo, ao reexecutar uma célula que só decora uma função já definida), o `decorador_y` pode devolver o resultado da primeira vez em vez de montar tudo de novo.
+#
+# Guardamos os resultados num `WeakValueDictionary`, usando o `id` da função como chave.
+# Enquanto a função decorada existir ela guarda uma referência à original, então esse `id` não pode ser reaproveitado por outra função.
+# E quando ninguém mais usar a função decorada, ela some do dicionário sozinha.
+#
+# Aproveitamos também para anotar na função decorada o nome e a função original (`__wrapped__`), como o `functools.wraps` faria, mas sem copiar os outros atributos que ele copia.
+
+# %%
+from weakref import WeakValueDictionary
+
+ja_decoradas = WeakValueDictionary()
+
+def decorador_y(func):
+
+    func_y = ja_decoradas.get(id(func))
+
+    if func_y is None:
+        func_y = auto_aplicador( auto_aplica_func_interna(func) )
+        func_y.__wrapped__ = func
+        nome = getattr(func, '__name__', None)
+        if nome is not None:
+            func_y.__name__ = nome
+        ja_decoradas[id(func)] = func_y
+
+    return func_y
+
+def fatorial(rec, n):
+
+    if n==0:
+        return 1
+    else:
+        return n*rec(n-1)
+
+assert decorador_y(fatorial) is decorador_y(fatorial)
+assert decorador_y(fatorial)(5) == 5*4*3*2*1
+assert decorador_y(fatorial).__name__ == 'fatorial'
+
+def fatorial_vezes(k, rec, n):
+
+    if n==0:
+        return k
+    else:
+        return n*rec(n-1)
+
+assert decorador_y(partial(fatorial_vezes, 1))(5) == 5*4*3*2*1
+
+# %% [markdown]
+# ## Bônus: e a pilha?
+#
+# Tem um preço escondido em tudo isso.
+# Cada passo da recursão passa pelo `partial` do `auto_aplicador`, pela `nova_func` da `auto_aplica_func_interna` e pela nossa própria função.
+# E nenhuma delas termina antes que o passo seguinte termine.
+# Ou seja, a pilha de chamadas cresce pelo menos 2 vezes mais rápido do que numa recursão comum, e um `fact(500)` já estoura o limite de recursão do Python.
+#
+# Uma saída é o chamado trampolim.
+# Em vez de chamar o próximo passo, a função **devolve** um pedido de chamada: um objeto que guarda qual função chamar e com quais argumentos.
+# Quem recebe esse pedido é um laço que fica "quicando" até receber algo que não seja um pedido.
+# Assim a pilha nunca passa de uma chamada de profundidade.
+#
+# Sim, estamos usando um `while`.
+# Mas ele fica escondido dentro do decorador, e a função decorada continua sem loops e sem recursão explícita.
+# Só precisamos que a chamada a `rec` seja a última coisa que a função faz, com um `return` na frente.
+
+# %%
+class Salto:
+
+    __slots__ = ('func', 'args')
+
+    def __init__(self, func, *args):
+        self.func = func
+        self.args = args
+
+def decorador_y_trampolim(func):
+
+    def passo(t):
+        return func(adia_passo, t)
+
+    def adia_passo(t):
+        return Salto(passo, t)
+
+    def quica(t):
+        resultado = passo(t)
+
+        while isinstance(resultado, Salto):
+            resultado = resultado.func(*resultado.args)
+
+        return resultado
+
+    quica.__wrapped__ = func
+    nome = getattr(func, '__name__', None)
+    if nome is not None:
+        quica.__name__ = nome
+
+    return quica
+
+@decorador_y_trampolim
+def t_menos_trampolim(rec, t):
+
+    if t==0:
+        print('\nTemos uma decolagem!!\nE a pilha nem percebeu!\n')
+    else:
+        print(f'T menos {t}s para o lançamento')
+        return rec(t-1)
+
+t_menos_trampolim(5)
+
+@decorador_y_trampolim
+def eh_par(rec, n):
+
+    if n==0:
+        return True
+    elif n==1:
+        return False
+    else:
+        return rec(n-2)
+
+assert eh_par(10_000)
+assert not eh_par(10_001)
+
+# %% [markdown]
+# ## Bônus: lembrando resultados
+#
+# A `fact` refaz toda a descida até `0` a cada chamada, mesmo que já tenhamos calculado aqueles valores antes.
+# Como ela não tem efeitos colaterais, podemos guardar cada resultado num dicionário e consultá-lo antes de calcular.
+#
+# Até daria para usar o `functools.cache`, mas ele usaria como chave também o `rec`.
+# Isso só funciona porque, desde o bônus do `partial` único, o `rec` é o mesmo objeto em todos os passos; com a `auto_aplica_func_interna` original, seria um objeto novo a cada passo e nada seria reaproveitado.
+# Para não depender desse detalhe, fazemos mais um decorador, bem simples, que guarda os resultados usando só o `t` como chave.
+# Ele se encaixa direitinho embaixo do `decorador_y`, da mesma forma que a `auto_aplica_func_interna` se encaixou embaixo do `auto_aplicador`.
+# E como cada chamada a `rec` também passa por ele, os passos intermediários da recursão também ficam guardados.
+#
+# Só não dá pra usar isso na `t_menos`: o que ela faz é justamente imprimir, e uma contagem lembrada não imprimiria nada.
+
+# %%
+def memoriza(func):
+
+    memoria = {}
+
+    def func_memorizada(rec, t):
+        if t not in memoria:
+            memoria[t] = func(rec, t)
+        return memoria[t]
+
+    func_memorizada.__wrapped__ = func
+    nome = getattr(func, '__name__', None)
+    if nome is not None:
+        func_memorizada.__name__ = nome
+
+    return func_memorizada
+
+@decorador_y
+@memoriza
+def fact_memorizado(rec, n):
+
+    if n==0:
+        return 1
+    else:
+        return n*rec(n-1)
+
+assert fact_memorizado(5) == 5*4*3*2*1
+assert fact_memorizado(6) == 6*5*4*3*2*1    # só calcula o passo n=6, o resto já estava guardado
+
+# %% [markdown]
+# ## Bônus: tirando o Y do caminho
+#
+# Uma última curiosidade.
+# Para funções como a `fact`, em que o `rec` só aparece sendo chamado dentro de um `return`, o decorador Y produz exatamente o mesmo resultado que a recursão comum que nos proibimos de escrever.
+# Todo o resto (o `partial`, a `nova_func`, ...) só está ali para que a função consiga chamar a si mesma.
+#
+# Então podemos deixar o próprio decorador escrever essa recursão por nós!
+# O módulo `inspect` nos dá o código fonte da função, o módulo `ast` transforma esse código numa árvore que podemos modificar, e `compile` e `exec` transformam a árvore modificada de volta em função.
+# A modificação é trocar todo `rec` pelo nome da própria função e remover o parâmetro `rec`.
+# A nova função é definida dentro de uma outra função, a `fabrica`, para que o nome dela fique no fechamento e não vaze para o escopo global.
+#
+# Quando a função não se encaixa nesse formato, como a `t_menos`, que chama o `rec` fora de um `return`, ou quando não conseguimos o código fonte de um `def` (uma `lambda`, por exemplo), usamos o `decorador_y` de sempre.
+
+# %%
+import ast
+import inspect
+import textwrap
+from math import factorial
+
+def rec_so_em_returns(definicao, rec):
+
+    chamadas_em_returns = set()
+
+    for no in ast.walk(definicao):
+        if isinstance(no, ast.Return) and no.value is not None:
+            for sub in ast.walk(no.value):
+                if (isinstance(sub, ast.Call) and isinstance(sub.func, ast.Name)
+                        and sub.func.id == rec and len(sub.args) == 1 and not sub.keywords):
+                    chamadas_em_returns.add(sub.func)
+
+    return all(no in chamadas_em_returns
+               for no in ast.walk(definicao)
+               if isinstance(no, ast.Name) and no.id == rec)
+
+def definicao_de(func):
+
+    try:
+        arvore = ast.parse(textwrap.dedent(inspect.getsource(func)))
+    except (OSError, TypeError, SyntaxError):
+        return None
+
+    definicao = arvore.body[0]
+
+    # Para uma lambda, por exemplo, o código fonte é a linha inteira onde ela
+    # aparece, que pode até ser a linha de um outro `def`
+    if (not isinstance(definicao, ast.FunctionDef) or not definicao.args.args
+            or definicao.name != func.__code__.co_name):
+        return None
+
+    return definicao
+
+def decorador_y_especializado(func):
+
+    definicao = definicao_de(func)
+
+    if definicao is None:
+        return decorador_y(func)
+
+    rec = definicao.args.args[0].arg
+
+    if func.__code__.co_freevars or not rec_so_em_returns(definicao, rec):
+        return decorador_y(func)
+
+    # A chamada recursiva vai para um nome que não aparece em lugar nenhum da
+    # função, para que nenhuma variável local com o nome dela tome o seu lugar
+    usados = {no.id for no in ast.walk(definicao) if isinstance(no, ast.Name)}
+    usados |= {no.arg for no in ast.walk(definicao) if isinstance(no, ast.arg)}
+    usados |= {no.name for no in ast.walk(definicao)
+               if isinstance(no, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))}
+
+    nome = '_' + definicao.name
+    while nome in usados:
+        nome = '_' + nome
+
+    for no in ast.walk(definicao):
+        if isinstance(no, ast.Name) and no.id == rec:
+            no.id = nome
+
+    del definicao.args.args[0]
+    definicao.decorator_list = []
+    definicao.name = nome
+
+    fabrica = ast.parse('def fabrica():\n    pass').body[0]
+    fabrica.body = [definicao, ast.Return(ast.Name(nome, ast.Load()))]
+
+    modulo = ast.Module([fabrica], type_ignores=[])
+    ast.fix_missing_locations(modulo)
+    ast.increment_lineno(modulo, func.__code__.co_firstlineno - 1)
+
+    nomes = {}
+    exec(compile(modulo, inspect.getsourcefile(func), 'exec'), func.__globals__, nomes)
+
+    especializada = nomes['fabrica']()
+    especializada.__name__ = func.__name__
+    especializada.__qualname__ = func.__qualname__
+
+    return especializada
+
+@decorador_y_especializado
+def fact_especializado(rec, n):
+
+    if n==0:
+        return 1
+    else:
+        return n*rec(n-1)
+
+@decorador_y_especializado
+def t_menos_especializado(rec, t):
+
+    if t==0:
+        print('\nTemos uma decolagem!!\nSem especialização, mas com Y!\n')
+    else:
+        print(f'T menos {t}s para o lançamento')
+        rec(t-1)
+
+assert fact_especializado(5) == 5*4*3*2*1
+assert fact_especializado(900) == factorial(900)    # com o Y, fact(500) já estourava a pilha
+
+fact_lambda = decorador_y_especializado(lambda rec, n: 1 if n==0 else n*rec(n-1))   # não é um def: usa o decorador_y
+
+assert fact_lambda(5) == 5*4*3*2*1
+
+@decorador_y_especializado
+def conta(rec, n):
+
+    if n == 0:
+        return 0
+    conta = 1
+    return conta + rec(n-1)
+
+def dobro_do_fact(n): return 2*decorador_y_especializado(lambda rec, n: 1 if n==0 else n*rec(n-1))(n)
+
+assert conta(3) == 3    # a variável local `conta` não atrapalha a recursão
+assert conta.__name__ == 'conta'
+assert dobro_do_fact(5) == 2*5*4*3*2*1    # a lambda não é confundida com o `def` da mesma linha
+
+t_menos_especializado(3)
+
+# %% [markdown]
+# Dá pra ir um passo além com funções do formato exato da `fact`:
+# ```python
+# if n==BASE:
+#     return VALOR
+# else:
+#     return n OP rec(n-1)
+# ```
+# Nesse caso, o resultado para `n` é `n OP (n-1 OP (... OP VALOR))`, que dá pra calcular de baixo pra cima com um único `for`, sem recursão nenhuma.
+# É isso que o `decorador_y_iterativo` faz: reconhece esse formato na árvore da função e monta o código do `for` correspondente.
+#
+# Para qualquer `n` que não seja um inteiro maior ou igual a `BASE`, a função original nunca chegaria no caso base, então deixamos esses casos com a versão recursiva, que se comporta exatamente como a original.
+# E quando a função não tem esse formato, usamos o `decorador_y_especializado`.
+
+# %%
+def formato_acumulavel(definicao, rec):
+
+    if len(definicao.args.args) != 2 or not definicao.body or not isinstance(definicao.body[0], ast.If):
+        return None
+
+    se = definicao.body[0]
+    senao = se.orelse if se.orelse else definicao.body[1:]
+    n = definicao.args.args[1].arg
+
+    def eh_nome(no, nome):
+        return isinstance(no, ast.Name) and no.id == nome
+
+    teste = se.test
+    if not (isinstance(teste, ast.Compare) and eh_nome(teste.left, n)
+            and len(teste.ops) == 1 and isinstance(teste.ops[0], ast.Eq)
+            and isinstance(teste.comparators[0], ast.Constant)
+            and type(teste.comparators[0].value) is int):
+        return None
+
+    if (se.orelse and len(definicao.body) != 1) or len(se.body) != 1 or len(senao) != 1:
+        return None
+
+    caso_base, passo = se.body[0], senao[0]
+    if not (isinstance(caso_base, ast.Return) and isinstance(caso_base.value, ast.Constant)):
+        return None
+
+    if not (isinstance(passo, ast.Return) and isinstance(passo.value, ast.BinOp)):
+        return None
+
+    conta = passo.value
+    chamada = conta.right
+    if not (eh_nome(conta.left, n) and isinstance(chamada, ast.Call) and eh_nome(chamada.func, rec)
+            and len(chamada.args) == 1 and not chamada.keywords):
+        return None
+
+    anterior = chamada.args[0]
+    if not (isinstance(anterior, ast.BinOp) and eh_nome(anterior.left, n) and isinstance(anterior.op, ast.Sub)
+            and isinstance(anterior.right, ast.Constant) and anterior.right.value == 1):
+        return None
+
+    return teste.comparators[0].value, caso_base.value.value, conta.op
+
+def decorador_y_iterativo(func):
+
+    recursiva = decorador_y_especializado(func)
+    definicao = definicao_de(func)
+
+    if definicao is None or func.__code__.co_freevars:
+        return recursiva
+
+    formato = formato_acumulavel(definicao, definicao.args.args[0].arg)
+    if formato is None:
+        return recursiva
+
+    base, valor, op = formato
+    n = definicao.args.args[1].arg
+    conta = ast.unparse(ast.BinOp(ast.Name('_i'), op, ast.Name('_acumulado')))
+
+    codigo = (
+        f'def fabrica(_recursiva):\n'
+        f'    def {definicao.name}({n}):\n'
+        f'        if not isinstance({n}, int) or {n} < {base}:\n'
+        f'            return _recursiva({n})\n'
+        f'        _acumulado = {valor!r}\n'
+        f'        for _i in range({base} + 1, {n} + 1):\n'
+        f'            _acumulado = {conta}\n'
+        f'        return _acumulado\n'
+        f'    return {definicao.name}\n'
+    )
+
+    nomes = {}
+    exec(compile(codigo, '<decorador_y_iterativo>', 'exec'), func.__globals__, nomes)
+
+    return nomes['fabrica'](recursiva)
+
+@decorador_y_iterativo
+def fact_iterativo(rec, n):
+
+    if n==0:
+        return 1
+    else:
+        return n*rec(n-1)
+
+@decorador_y_iterativo
+def soma_ate(rec, n):
+
+    if n==1:
+        return 1
+    else:
+        return n + rec(n-1)
+
+assert fact_iterativo(5) == 5*4*3*2*1
+assert fact_iterativo(5000) == factorial(5000)    # nem a versão especializada aguentaria
+assert decorador_y_iterativo(lambda rec, n: 1 if n==0 else n*rec(n-1))(5) == 5*4*3*2*1
+assert soma_ate(10_000) == 10_000 * 10_001 // 2